@@ -1,6 +1,9 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, g, request, jsonify, stream_with_context
 from flask_cors import CORS
 import os
+import json
+import time
+import uuid
 import logging
 from modules.ocr import extract_text_from_image
 from modules.pdf_processor import extract_text_from_pdf
@@ -10,6 +13,8 @@ from modules.recommender import get_recommendations
 from modules.translator import translate_text, LANGUAGES
 from modules.validator import validate_medical_report
 from utils.file_handler import save_uploaded_file, delete_file
+from utils.profiler import profile_request, profile_stream, sanitize_request_id, REQUEST_ID_HEADER
+from utils.logging_config import configure_logging
 
 # --- Application Setup ---
 import re
@@ -17,9 +22,8 @@ import re
 # --- Application Setup ---
 app = Flask(__name__)
 
-# Configure Logging (including CORS)
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
-logging.getLogger('flask_cors').level = logging.DEBUG
+# Configure Logging (queued; formatting and I/O happen off the request thread)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 # Strict CORS Configuration
@@ -33,7 +37,8 @@ CORS(app,
          ]
      }},
      supports_credentials=True,
-     allow_headers=["Content-Type", "Authorization"],
+     allow_headers=["Content-Type", "Authorization", "X-Profile", "X-Request-ID"],
+     expose_headers=["X-Request-ID"],
      methods=["GET", "POST", "OPTIONS"]
 )
 
@@ -44,6 +49,18 @@ ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'pdf'}
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+@app.before_request
+def assign_request_id():
+    """Tags the request with the caller's (sanitized) X-Request-ID or a new one, for logs and profiles."""
+    g.request_id = sanitize_request_id(request.headers.get(REQUEST_ID_HEADER)) or uuid.uuid4().hex
+
+@app.after_request
+def echo_request_id(response):
+    """Returns the request id on every response so clients can quote it against logs and profiles."""
+    if g.get("request_id"):
+        response.headers[REQUEST_ID_HEADER] = g.request_id
+    return response
+
 # --- Routes ---
 
 @app.route('/health', methods=['GET'])
@@ -51,106 +68,184 @@ def health_check():
     """Simple health check endpoint."""
     return jsonify({"status": "healthy", "service": "SmartMed AI Backend"}), 200
 
-@app.route('/analyze', methods=['POST'])
-def analyze_report():
+def run_analysis_pipeline(file_path, filename, language):
     """
-    Main analysis endpoint.
-    Expects a file in the multipart-form data with key 'file'.
-    Optional param: 'language' (default: 'en')
+    Runs the analysis stages on a saved upload, yielding (event, data) as each
+    stage finishes. The last event is always ('result', (body, status_code)),
+    where body is the same JSON payload /analyze returns.
+    Stage durations are logged once the pipeline finishes.
     """
-    if 'file' not in request.files:
-        return jsonify({"error": "No file part in the request"}), 400
-        
-    file = request.files['file']
-    language = request.form.get('language', 'en')
-    print("LANGUAGE RECEIVED FROM FRONTEND:", language)
-    
-    if file.filename == '':
-        return jsonify({"error": "No file selected"}), 400
-        
-    if file and allowed_file(file.filename):
-        # 1. Save File
-        file_path = save_uploaded_file(file, UPLOAD_FOLDER)
-        if not file_path:
-             return jsonify({"error": "Failed to save file"}), 500
-        
-        try:
-            # 2. Extract Text
-            extracted_text = ""
-            if file.filename.lower().endswith('.pdf'):
-                extracted_text = extract_text_from_pdf(file_path)
-            else:
-                extracted_text = extract_text_from_image(file_path)
-            
-            if not extracted_text:
-                return jsonify({"error": "Unreadable document. Please upload a clearer image or PDF."}), 422
-
-            # 3. Validate
-            is_valid, score, details = validate_medical_report(extracted_text)
-            if not is_valid:
-                error_msg = "The document does not appear to be a valid lab report."
-                details_msg = "Invalid medical report."
-                
-                if language != 'en':
-                    error_msg = translate_text(error_msg, language)
-                    details_msg = translate_text(details_msg, language)
-
-                return jsonify({
-                    "error": details_msg,
-                    "details": details,
-                    "message": error_msg
-                }), 400
-
-            # 4. Extract Data (NLP)
-            medical_data = extract_medical_data(extracted_text)
-            if not medical_data:
-                return jsonify({"message": "No structured data found in report.", "data": []}), 200
-
-            # 5. Analyze Data
-            analyzed_results = analyze_medical_data(medical_data)
-
-            # 6. Generate Recommendations
-            recommendations = get_recommendations(analyzed_results)
-
-            # 7. Translate (if needed)
-            # Translate 'interpretation' in analyzed_results
-            # Translate recommendations
+    stage_timings = {}
+    stage_start = time.perf_counter()
+
+    def finish_stage(name):
+        nonlocal stage_start
+        now = time.perf_counter()
+        stage_timings[name] = round((now - stage_start) * 1000, 2)
+        stage_start = now
+
+    try:
+        # 2. Extract Text
+        extracted_text = ""
+        if filename.lower().endswith('.pdf'):
+            extracted_text = extract_text_from_pdf(file_path)
+        else:
+            extracted_text = extract_text_from_image(file_path)
+        finish_stage("extract_text")
+
+        if not extracted_text:
+            yield "result", ({"error": "Unreadable document. Please upload a clearer image or PDF."}, 422)
+            return
+        yield "text_extracted", {"characters": len(extracted_text)}
+
+        # 3. Validate
+        is_valid, score, details = validate_medical_report(extracted_text)
+        finish_stage("validate")
+        yield "validation", {"is_valid": is_valid, "score": score, "details": details}
+        if not is_valid:
+            error_msg = "The document does not appear to be a valid lab report."
+            details_msg = "Invalid medical report."
+
             if language != 'en':
-                # Translate Results
-                for item in analyzed_results:
-                    item['interpretation'] = translate_text(item['interpretation'], language)
-                
-                # Translate Recommendations
-                translated_recs = {}
-                for key, rec_group in recommendations.items():
-                    translated_recs[key] = {
+                error_msg = translate_text(error_msg, language)
+                details_msg = translate_text(details_msg, language)
+
+            yield "result", ({
+                "error": details_msg,
+                "details": details,
+                "message": error_msg
+            }, 400)
+            return
+
+        # 4. Extract Data (NLP)
+        medical_data = extract_medical_data(extracted_text)
+        finish_stage("extract_data")
+        if not medical_data:
+            yield "result", ({"message": "No structured data found in report.", "data": []}, 200)
+            return
+        yield "structured_rows", medical_data
+
+        # 5. Analyze Data
+        analyzed_results = analyze_medical_data(medical_data)
+        finish_stage("analyze")
+        yield "analysis", analyzed_results
+
+        # 6. Generate Recommendations
+        recommendations = get_recommendations(analyzed_results)
+        finish_stage("recommend")
+        yield "recommendations", recommendations
+
+        # 7. Translate (if needed)
+        # Translate 'interpretation' in analyzed_results
+        # Translate recommendations, one test at a time so progress can be streamed
+        if language != 'en':
+            translated_recs = {}
+            for item in analyzed_results:
+                item['interpretation'] = translate_text(item['interpretation'], language)
+
+                rec_group = recommendations.get(item['test'])
+                if rec_group:
+                    translated_recs[item['test']] = {
                         "status": rec_group['status'], # Keep status logic (High/Low) in English or translate? Usually status logic tokens stay, display translates.
                         "foods": [translate_text(f, language) for f in rec_group['foods']],
                         "lifestyle": [translate_text(l, language) for l in rec_group['lifestyle']],
                         "avoid": [translate_text(a, language) for a in rec_group['avoid']]
                     }
-                recommendations = translated_recs
 
-            # 8. Cleanup (Optional: Delete file after processing)
-            # delete_file(file_path) 
-            # Commented out for debugging, uncomment in production
+                yield "translation", {
+                    "test": item['test'],
+                    "interpretation": item['interpretation'],
+                    "recommendations": translated_recs.get(item['test'])
+                }
+            recommendations = translated_recs
+            finish_stage("translate")
+
+        # 8. Cleanup (Optional: Delete file after processing)
+        # delete_file(file_path) 
+        # Commented out for debugging, uncomment in production
 
-            return jsonify({
-                "status": "success",
-                "language": language,
-                "results": analyzed_results,
-                "recommendations": recommendations,
-                "metadata": details
-            }), 200
+        yield "result", ({
+            "status": "success",
+            "language": language,
+            "results": analyzed_results,
+            "recommendations": recommendations,
+            "metadata": details
+        }, 200)
 
-        except Exception as e:
-            logger.error(f"Error processing file: {e}", exc_info=True)
-            return jsonify({"error": str(e)}), 500
-            
-    else:
-        return jsonify({"error": "File type not allowed. Use PDF, JPG, PNG."}), 400
+    except Exception as e:
+        logger.error("Error processing file: %s", e, exc_info=True)
+        yield "result", ({"error": str(e)}, 500)
+    finally:
+        logger.info("Pipeline finished in %.2f ms", sum(stage_timings.values()),
+                    extra={"stage_timings": stage_timings})
 
+def receive_upload():
+    """
+    Validates and saves the uploaded file.
+    Returns (file_path, filename, language, None) or (None, None, None, error_response).
+    """
+    if 'file' not in request.files:
+        return None, None, None, (jsonify({"error": "No file part in the request"}), 400)
+
+    file = request.files['file']
+    language = request.form.get('language', 'en')
+    logger.debug("Language received from frontend: %s", language)
+
+    if file.filename == '':
+        return None, None, None, (jsonify({"error": "No file selected"}), 400)
+
+    if not (file and allowed_file(file.filename)):
+        return None, None, None, (jsonify({"error": "File type not allowed. Use PDF, JPG, PNG."}), 400)
+
+    # 1. Save File
+    file_path = save_uploaded_file(file, UPLOAD_FOLDER)
+    if not file_path:
+        return None, None, None, (jsonify({"error": "Failed to save file"}), 500)
+
+    return file_path, file.filename, language, None
+
+@app.route('/analyze', methods=['POST'])
+@profile_request
+def analyze_report():
+    """
+    Main analysis endpoint.
+    Expects a file in the multipart-form data with key 'file'.
+    Optional param: 'language' (default: 'en')
+    """
+    file_path, filename, language, error_response = receive_upload()
+    if error_response:
+        return error_response
+
+    for event, data in run_analysis_pipeline(file_path, filename, language):
+        if event == "result":
+            body, status_code = data
+    return jsonify(body), status_code
+
+@app.route('/analyze/stream', methods=['POST'])
+def analyze_report_stream():
+    """
+    Streaming variant of /analyze. Same inputs; responds with NDJSON, one
+    {"event": ..., "data": ...} object per line as each stage finishes.
+    The final 'result' event carries the /analyze payload and its status_code.
+    """
+    file_path, filename, language, error_response = receive_upload()
+    if error_response:
+        return error_response
+
+    def generate():
+        yield json.dumps({"event": "upload_received", "data": {"filename": filename, "language": language}}) + "\n"
+        for event, data in run_analysis_pipeline(file_path, filename, language):
+            if event == "result":
+                body, status_code = data
+                yield json.dumps({"event": event, "status_code": status_code, "data": body}) + "\n"
+            else:
+                yield json.dumps({"event": event, "data": data}) + "\n"
 
+    response = Response(stream_with_context(profile_stream(generate())), mimetype='application/x-ndjson')
+    # Stop reverse proxies from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/languages', methods=['GET'])
 def get_languages():
@@ -0,0 +1,108 @@
+"""
+Perceptual-hash (dHash) reuse of OCR text for near-duplicate photos: the
+measurement behind not doing it.
+
+Reports printed from the same lab template with different values hash as
+close as, or closer than, two photos of one report, at every hash size, so
+any reuse threshold hands back another patient's text. modules/ocr.py
+therefore always runs OCR.
+
+Run with: python benchmarks/ocr_phash.py
+"""
+from PIL import Image
+
+HASH_SIZE = 16
+
+def compute_image_hash(image, hash_size=HASH_SIZE):
+    """
+    Difference hash (dHash) of a PIL image: compares neighbouring pixels of a
+    (hash_size + 1) x hash_size grayscale thumbnail. Returns an int.
+    """
+    # Let JPEG decode at reduced scale; the thumbnail needs very few pixels
+    image.draft('L', (hash_size * 8, hash_size * 8))
+    small = image.convert('L').resize((hash_size + 1, hash_size), Image.Resampling.BOX)
+    pixels = small.tobytes()
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def _synthetic_report(seed):
+    """
+    Renders a fake lab report page; every seed shares the layout but not the values.
+    """
+    from PIL import ImageDraw, ImageFont
+    import random
+
+    rng = random.Random(seed)
+    font = ImageFont.load_default(size=28)
+    image = Image.new('RGB', (1240, 1754), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.text((80, 60), "CITY DIAGNOSTICS LAB - COMPLETE BLOOD COUNT", font=font, fill=(0, 0, 0))
+    draw.text((80, 140), f"Patient ID: {rng.randint(10000, 99999)}  Age: {rng.randint(20, 80)}", font=font, fill=(0, 0, 0))
+    tests = ["Hemoglobin", "Glucose", "Cholesterol", "HDL", "LDL", "Platelet", "WBC", "RBC", "TSH", "Creatinine"]
+    for i, test in enumerate(tests):
+        draw.text((80, 260 + i * 60), f"{test:<14} {rng.uniform(1, 300):7.1f}  mg/dL   10-100", font=font, fill=(0, 0, 0))
+    return image
+
+def _photo_variant(image, rng):
+    """
+    Simulates a re-taken photo: slight rotation, crop and JPEG recompression.
+    """
+    import io
+
+    image = image.rotate(rng.uniform(-2, 2), fillcolor=(255, 255, 255))
+    width, height = image.size
+    crop = rng.uniform(0, 0.03)
+    image = image.crop((int(width * crop), int(height * crop), int(width * (1 - crop)), int(height * (1 - crop))))
+    buffer = io.BytesIO()
+    image.save(buffer, 'JPEG', quality=rng.randint(40, 90))
+    buffer.seek(0)
+    return Image.open(buffer)
+
+def benchmark(reports=20, copies=10, hash_sizes=(16, 32, 64), seed=0):
+    """
+    Hash cost, near-duplicate hit rate and false-reuse rate (different reports
+    within the threshold) on synthetic rotated/cropped/recompressed copies,
+    for several hash resolutions. Reuse would only be safe if the closest pair
+    of different reports were farther apart than the farthest copy.
+    Run with: python benchmarks/ocr_phash.py
+    """
+    import time
+    import random
+
+    originals = [_synthetic_report(i) for i in range(reports)]
+
+    for hash_size in hash_sizes:
+        rng = random.Random(seed)
+        original_hashes = [compute_image_hash(image.copy(), hash_size) for image in originals]
+
+        copy_distances = []
+        hash_time = 0.0
+        for image, image_hash in zip(originals, original_hashes):
+            for _ in range(copies):
+                variant = _photo_variant(image, rng)
+                start = time.perf_counter()
+                variant_hash = compute_image_hash(variant, hash_size)
+                hash_time += time.perf_counter() - start
+                copy_distances.append((variant_hash ^ image_hash).bit_count())
+
+        other_distances = [
+            (original_hashes[i] ^ original_hashes[j]).bit_count()
+            for i in range(reports) for j in range(i + 1, reports)
+        ]
+
+        bits = hash_size * hash_size
+        print(f"{bits} bits: {hash_time / len(copy_distances) * 1000:.2f} ms/image, "
+              f"farthest copy {max(copy_distances)}, closest different report {min(other_distances)}")
+        for fraction in (0.01, 0.02, 0.05, 0.1):
+            threshold = int(bits * fraction)
+            hits = sum(d <= threshold for d in copy_distances) / len(copy_distances)
+            false_reuse = sum(d <= threshold for d in other_distances) / len(other_distances)
+            print(f"  threshold {threshold:>3}: near-duplicate hit rate {hits:.1%}, false reuse {false_reuse:.1%}")
+
+if __name__ == '__main__':
+    benchmark()
@@ -78,3 +78,56 @@ export const analyzeReport = async (file, language, onProgress) => {
 };
 
 
+// Streaming variant of analyzeReport: reads NDJSON events from /analyze/stream
+// and calls onEvent(event, data) as each pipeline stage finishes.
+// Resolves with the same payload analyzeReport returns.
+export const analyzeReportStream = async (file, language, onEvent) => {
+    const formData = new FormData();
+    formData.append('file', file);
+    formData.append('language', language);
+
+    try {
+        const response = await fetch(`${API_URL}/analyze/stream`, {
+            method: 'POST',
+            body: formData,
+        });
+
+        // Upload validation errors come back as plain JSON, not a stream
+        if (!response.headers.get('Content-Type')?.includes('application/x-ndjson')) {
+            return await response.json();
+        }
+
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        let result = { error: "An unexpected error occurred." };
+
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+
+            buffer += decoder.decode(value, { stream: true });
+            const lines = buffer.split('\n');
+            buffer = lines.pop(); // Keep the incomplete trailing line
+
+            for (const line of lines) {
+                if (!line.trim()) continue;
+                const message = JSON.parse(line);
+                if (onEvent) {
+                    onEvent(message.event, message.data);
+                }
+                if (message.event === 'result') {
+                    result = message.data;
+                }
+            }
+        }
+        return result;
+
+    } catch (error) {
+        console.error("API Error (Analyze Stream):", error);
+        return {
+            error: "Server is still starting or unavailable. Please try again in a minute.",
+            details: error.message
+        };
+    }
+};
@@ -1,4 +1,5 @@
 import re
+from modules.fuzzy_matcher import FuzzyIndex, CLINICAL_ALIASES, MAX_CLINICAL_DISTANCE
 
 # Standard Reference Ranges Dictionary
 # Format: "keyword" : {"min": val, "max": val, "unit": "unit"}
@@ -44,6 +45,10 @@ TEST_KNOWLEDGE = {
     }
 }
 
+# Fuzzy fallbacks used when the simple keyword match misses (OCR-noisy names)
+RANGE_INDEX = FuzzyIndex(STANDARD_RANGES, CLINICAL_ALIASES, whole_name=True)
+KNOWLEDGE_INDEX = FuzzyIndex(TEST_KNOWLEDGE, CLINICAL_ALIASES, whole_name=True)
+
 def parse_range(range_str):
     """
     Parses a reference range string into min and max values.
@@ -80,6 +85,11 @@ def get_standard_range(test_name):
     for key, data in STANDARD_RANGES.items():
         if key in test_name: # Simple keyword matching
             return data["min"], data["max"]
+
+    # Fuzzy matches pick a clinical range, so only near-exact ones count
+    key, distance = RANGE_INDEX.resolve(test_name)
+    if key and distance <= MAX_CLINICAL_DISTANCE:
+        return STANDARD_RANGES[key]["min"], STANDARD_RANGES[key]["max"]
     return None, None
 
 def analyze_medical_data(data):
@@ -130,6 +140,10 @@ def analyze_medical_data(data):
                     if key in test_name.lower():
                         found_key = key
                         break
+                if not found_key:
+                    key, distance = KNOWLEDGE_INDEX.resolve(test_name)
+                    if key and distance <= MAX_CLINICAL_DISTANCE:
+                        found_key = key
                 
                 if found_key:
                     interpretation = TEST_KNOWLEDGE[found_key].get(status.lower(), f"Result is {status}.")
@@ -0,0 +1,210 @@
+import re
+import time
+from functools import lru_cache
+
+# Common alternate spellings / abbreviations mapped to the canonical keys used
+# across the analyzer, recommender and NLP vocabularies.
+TEST_ALIASES = {
+    "haemoglobin": "hemoglobin",
+    "hb": "hemoglobin",
+    "hgb": "hemoglobin",
+    "blood sugar": "glucose",
+    "sugar": "glucose",
+    "thrombocyte": "platelet",
+    "platelets": "platelet",
+    "leukocyte": "wbc",
+    "leucocyte": "wbc",
+    "erythrocyte": "rbc",
+    "triglyceride": "triglycerides",
+    "thyrotropin": "tsh",
+    "ast": "sgot",
+    "alt": "sgpt",
+    "haematocrit": "hematocrit",
+    "urate": "uric acid",
+}
+
+# Aliases that also name a different analyte in another specimen or panel
+# (urine sugar, urine leukocytes, ESR, HbA1c); they help recognise a test
+# name but never pick a clinical range or recommendation.
+AMBIGUOUS_ALIASES = {"hb", "sugar", "leukocyte", "leucocyte", "erythrocyte", "urate"}
+CLINICAL_ALIASES = {a: c for a, c in TEST_ALIASES.items() if a not in AMBIGUOUS_ALIASES}
+
+# Real analytes that sit within a few edits of a different vocabulary term.
+# A name containing any of these words never resolves fuzzily
+# (e.g. creatine kinase / CK / CPK must not become creatinine).
+NON_FUZZY_WORDS = {
+    "creatine", "kinase", "ck", "cpk", "ckmb", "creatin",
+}
+# Qualifiers that turn a known test name into a different analyte
+# (Hb A1c, urine glucose, leukocyte esterase, sedimentation rate).
+# Names containing them never resolve in whole-name mode.
+ANALYTE_QUALIFIERS = {
+    "a1c", "glycated", "glycosylated", "urine", "esterase", "sedimentation", "rate",
+}
+# Specimen words that don't change the analyte, dropped before a whole-name match
+SPECIMEN_WORDS = {"serum", "plasma", "s"}
+
+# Only the index lookup is fuzzy; the minimum term length keeps short
+# abbreviations (hdl/ldl, t3/t4) from resolving to each other.
+MIN_FUZZY_LENGTH = 5
+# OCR noise rarely changes a word's length by more than one character
+MAX_LENGTH_DIFFERENCE = 1
+# Largest distance accepted where a match drives a clinical result
+# (reference ranges, interpretations, recommendations)
+MAX_CLINICAL_DISTANCE = 1
+RESOLVE_CACHE_SIZE = 1024
+
+def _max_distance(term):
+    """
+    Edit budget allowed for a term: exact only for short abbreviations,
+    one edit for medium words, two for long ones.
+    """
+    if len(term) < MIN_FUZZY_LENGTH:
+        return 0
+    if len(term) < 8:
+        return 1
+    return 2
+
+def _trigrams(token):
+    padded = f"${token}$"
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def levenshtein(a, b, limit):
+    """
+    Edit distance between a and b, giving up early once every cell in a row
+    exceeds limit. Returns limit + 1 in that case.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    previous = list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        current = [i]
+        for j, cb in enumerate(b, 1):
+            cost = 0 if ca == cb else 1
+            current.append(min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+class FuzzyIndex:
+    """
+    Character-trigram inverted index over a fixed set of test names.
+    resolve() maps a noisy test name (e.g. 'Haemog1obin') to the closest
+    canonical key and its edit distance, or (None, None).
+    With whole_name=True (indexes that pick clinical ranges) the entire
+    cleaned name must match a term or alias; single words of a longer name
+    and names with an ANALYTE_QUALIFIERS word never resolve.
+    """
+
+    def __init__(self, terms, aliases=None, whole_name=False):
+        aliases = aliases or {}
+        self.whole_name = whole_name
+        self.terms = set(terms)
+        # Every indexed spelling points back to its canonical key
+        self.spellings = {term: term for term in self.terms}
+        for alias, canonical in aliases.items():
+            if canonical in self.terms:
+                self.spellings[alias] = canonical
+
+        self.index = {}
+        for spelling in self.spellings:
+            for gram in _trigrams(spelling):
+                self.index.setdefault(gram, set()).add(spelling)
+
+        # Per-instance LRU of recent resolutions
+        self.resolve = lru_cache(maxsize=RESOLVE_CACHE_SIZE)(self._resolve)
+
+    def _candidates(self, token):
+        found = set()
+        for gram in _trigrams(token):
+            found.update(self.index.get(gram, ()))
+        return found
+
+    def _resolve(self, test_name):
+        words = re.findall(r"[a-z0-9]+", test_name.lower())
+        if NON_FUZZY_WORDS.intersection(words):
+            return None, None
+        if self.whole_name:
+            if ANALYTE_QUALIFIERS.intersection(words):
+                return None, None
+            tokens = [" ".join(w for w in words if w not in SPECIMEN_WORDS)]
+        else:
+            # Single words plus adjacent pairs so 'uric acid' style terms are reachable
+            tokens = [w for w in words if len(w) > 1]
+            tokens += [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+        best_key, best_distance = None, None
+        for token in tokens:
+            if token in self.spellings:
+                return self.spellings[token], 0
+
+            for spelling in self._candidates(token):
+                limit = _max_distance(spelling)
+                if limit == 0 or abs(len(token) - len(spelling)) > MAX_LENGTH_DIFFERENCE:
+                    continue
+                distance = levenshtein(token, spelling, limit)
+                if distance <= limit and (best_distance is None or distance < best_distance):
+                    best_key, best_distance = self.spellings[spelling], distance
+
+        return best_key, best_distance
+
+def _corrupt(name, rng):
+    """
+    Applies one or two OCR-style errors to a name for benchmarking.
+    """
+    confusions = {"l": "1", "o": "0", "e": "a", "i": "1", "s": "5", "b": "6", "g": "q"}
+    chars = list(name)
+    for _ in range(rng.choice([1, 2])):
+        pos = rng.randrange(len(chars))
+        if chars[pos] in confusions and rng.random() < 0.7:
+            chars[pos] = confusions[chars[pos]]
+        elif rng.random() < 0.5:
+            chars.insert(pos, chars[pos])
+        else:
+            del chars[pos]
+    return "".join(chars)
+
+def benchmark(samples=2000, seed=0):
+    """
+    Recall and latency of FuzzyIndex.resolve on synthetically corrupted names.
+    Run with: python -m modules.fuzzy_matcher
+    """
+    import random
+    from modules.nlp_processor import COMMON_MEDICAL_TESTS
+    from modules.analyzer import STANDARD_RANGES
+    from modules.recommender import RECOMMENDATIONS_KB
+
+    rng = random.Random(seed)
+    vocab = set(COMMON_MEDICAL_TESTS) | set(STANDARD_RANGES) | set(RECOMMENDATIONS_KB)
+    index = FuzzyIndex(vocab, TEST_ALIASES)
+    # Abbreviations are matched exactly on purpose, so they are left out of the recall set
+    targets = sorted(t for t in vocab if len(t) >= MIN_FUZZY_LENGTH)
+    cases = [(t, _corrupt(t, rng)) for t in (rng.choice(targets) for _ in range(samples))]
+
+    hits = 0
+    start = time.perf_counter()
+    for expected, noisy in cases:
+        key, _ = index._resolve(noisy)
+        hits += key == expected
+    cold = (time.perf_counter() - start) / len(cases)
+
+    # Warm the LRU untimed with a working set that fits in it, then time a
+    # pass where every lookup is a cache hit
+    working_set = list(dict.fromkeys(noisy for _, noisy in cases))[:RESOLVE_CACHE_SIZE]
+    for noisy in working_set:
+        index.resolve(noisy)
+    misses_before = index.resolve.cache_info().misses
+    start = time.perf_counter()
+    for noisy in working_set:
+        index.resolve(noisy)
+    warm = (time.perf_counter() - start) / len(working_set)
+    assert index.resolve.cache_info().misses == misses_before
+
+    print(f"Terms indexed: {len(index.spellings)}, samples: {len(cases)}")
+    print(f"Recall: {hits / len(cases):.1%}")
+    print(f"Latency uncached: {cold * 1e6:.1f} us/name, LRU hit: {warm * 1e6:.2f} us/name")
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,309 @@
+import os
+import re
+import threading
+from collections import OrderedDict, Counter
+
+# Layout Fingerprinting
+# Reports from one lab chain share a header and table layout. The header words
+# identify the template; each template learns, from successful parses, the test
+# names and units it prints and the boilerplate lines that never yield a row.
+# Only names that recur are learned, and boilerplate lines are kept as hashes,
+# so one-off OCR noise and patient lines never accumulate in a template.
+LAYOUT_CACHE_ENABLED = os.environ.get("LAYOUT_CACHE", "1") != "0"
+HEADER_LINES = 6           # Non-empty letterhead lines at the top used for the fingerprint
+MIN_TEMPLATE_TOKENS = 5    # Fewer header words than this is too weak to identify a lab
+TEMPLATE_MATCH_THRESHOLD = 0.8 # Share of a template's header words a report must contain
+MIN_ROWS_TO_LEARN = 3      # Only parses with at least this many rows teach a template
+MAX_TEMPLATES = 64
+IGNORE_LINE_MIN_SEEN = 2   # A line must yield nothing in this many reports to be skipped
+MAX_CANDIDATE_LINES = 2000
+NAME_MIN_SEEN = 2          # A printed test name must recur before it joins the parser
+MAX_CANDIDATE_NAMES = 2000
+MAX_TEMPLATE_NAMES = 64    # OCR misspellings would otherwise grow the alternation forever
+MAX_TEMPLATE_UNITS = 32
+MAX_IGNORE_LINES = 64
+RARE_TOKEN_TEMPLATES = 3   # Header words shared by more templates than this don't shortlist
+HEADER_WORD = re.compile(r"[a-z]{3,}")
+
+def layout_fingerprint(lines):
+    """
+    Returns the set of header words (letters only, 3+ chars) from the first
+    HEADER_LINES non-empty lines of a report.
+    """
+    header = []
+    for line in lines:
+        if line.strip():
+            header.append(line)
+            if len(header) >= HEADER_LINES:
+                break
+    return frozenset(HEADER_WORD.findall(" ".join(header).lower()))
+
+class LayoutTemplate:
+    """
+    What has been learned about one lab's report layout.
+    """
+
+    def __init__(self, template_id, tokens):
+        self.template_id = template_id
+        self.tokens = tokens
+        self.names = set()          # Raw test names this lab printed in NAME_MIN_SEEN+ reports
+        self.units = set()
+        self.name_counts = Counter() # Reports each candidate name/unit appeared in
+        self.unit_counts = Counter()
+        self.ignore_lines = set()   # hash() of lines that never produced a row
+        self.line_counts = Counter() # Keyed by line hash too
+        self.reports = 0            # Successful parses learned from
+        self.hits = 0               # Reports dispatched to this template
+        self.parser = None          # Compiled row pattern, rebuilt when names/units grow
+
+class LayoutCache:
+    """
+    Recognizes known lab templates by header fingerprint and keeps a cached
+    row parser per template. A wrong or missed match only costs speed: every
+    line the template parser cannot read still goes through the generic path.
+    pattern_factory(names, units) builds the specialized regex; it is supplied
+    by the NLP module so both paths share the same value/range grammar.
+    """
+
+    def __init__(self, pattern_factory, enabled=LAYOUT_CACHE_ENABLED):
+        self.pattern_factory = pattern_factory
+        self.enabled = enabled
+        self.templates = OrderedDict() # template_id -> LayoutTemplate, least recent first
+        self.token_index = {}          # header word -> ids of templates containing it
+        self.lookups = 0
+        self.next_id = 1
+        self.lock = threading.Lock()
+
+    def match(self, tokens):
+        """
+        Returns the known template whose header words best appear in tokens, or None.
+        """
+        if not self.enabled or len(tokens) < MIN_TEMPLATE_TOKENS:
+            return None
+
+        with self.lock:
+            self.lookups += 1
+            # Shortlist templates through rare header words (lab name, address);
+            # words every letterhead has ("department", "lab") would match them all
+            candidates = set()
+            for token in tokens:
+                ids = self.token_index.get(token)
+                if ids and len(ids) <= RARE_TOKEN_TEMPLATES:
+                    candidates |= ids
+            if not candidates:
+                candidates = self.templates.keys()
+
+            best, best_score = None, TEMPLATE_MATCH_THRESHOLD
+            for template_id in candidates:
+                template = self.templates[template_id]
+                score = len(tokens & template.tokens) / len(template.tokens)
+                if score >= best_score:
+                    best, best_score = template, score
+            if best:
+                best.hits += 1
+                self.templates.move_to_end(best.template_id)
+            return best
+
+    def learn(self, template, tokens, names, units, empty_lines):
+        """
+        Folds a successful parse into its template, creating one (and evicting
+        the least recently used) if the report matched nothing known.
+        The row pattern is recompiled outside the lock, and only when a name
+        or unit has recurred often enough to be added.
+        """
+        if not self.enabled or len(tokens) < MIN_TEMPLATE_TOKENS or len(names) < MIN_ROWS_TO_LEARN:
+            return
+
+        rebuild = None
+        with self.lock:
+            if template is None:
+                template = LayoutTemplate(self.next_id, tokens)
+                self.next_id += 1
+                self.templates[template.template_id] = template
+                self._index_tokens(template, tokens, add=True)
+                while len(self.templates) > MAX_TEMPLATES:
+                    _, evicted = self.templates.popitem(last=False)
+                    self._index_tokens(evicted, evicted.tokens, add=False)
+            elif template.template_id in self.templates:
+                # Keep only header words every report shares (drops patient names etc.)
+                shared = template.tokens & tokens
+                if MIN_TEMPLATE_TOKENS <= len(shared) < len(template.tokens):
+                    self._index_tokens(template, template.tokens - shared, add=False)
+                    template.tokens = shared
+
+            template.reports += 1
+            added = _learn_recurring(template.names, template.name_counts, names,
+                                     MAX_TEMPLATE_NAMES, MAX_CANDIDATE_NAMES)
+            added |= _learn_recurring(template.units, template.unit_counts, units,
+                                      MAX_TEMPLATE_UNITS, MAX_CANDIDATE_NAMES)
+            if added and template.names and template.units:
+                rebuild = (frozenset(template.names), frozenset(template.units))
+
+            hashes = {hash(line) for line in empty_lines}
+            template.line_counts.update(hashes)
+            for line_hash in hashes:
+                if len(template.ignore_lines) >= MAX_IGNORE_LINES:
+                    break
+                if template.line_counts[line_hash] >= IGNORE_LINE_MIN_SEEN:
+                    template.ignore_lines.add(line_hash)
+            if len(template.line_counts) > MAX_CANDIDATE_LINES:
+                template.line_counts.clear()
+
+        if rebuild:
+            parser = self.pattern_factory(*rebuild)
+            with self.lock:
+                # A concurrent learn() may have grown the template meanwhile
+                if rebuild == (template.names, template.units):
+                    template.parser = parser
+
+    def _index_tokens(self, template, tokens, add):
+        for token in tokens:
+            if add:
+                self.token_index.setdefault(token, set()).add(template.template_id)
+            else:
+                ids = self.token_index.get(token)
+                if ids:
+                    ids.discard(template.template_id)
+                    if not ids:
+                        del self.token_index[token]
+
+    def stats(self):
+        """
+        Per-template hit counts and overall hit rate. A miss cannot be
+        attributed to a template (it matched none), so there is no
+        per-template rate; benchmark() measures one per lab instead.
+        """
+        with self.lock:
+            hits = sum(t.hits for t in self.templates.values())
+            return {
+                "lookups": self.lookups,
+                "hit_rate": hits / self.lookups if self.lookups else 0.0,
+                "templates": [
+                    {
+                        "template_id": t.template_id,
+                        "hits": t.hits,
+                        "reports_learned": t.reports,
+                        "known_tests": len(t.names),
+                        "ignore_lines": len(t.ignore_lines),
+                    }
+                    for t in self.templates.values()
+                ],
+            }
+
+def _learn_recurring(learned, counts, seen, limit, max_candidates):
+    """
+    Counts each value in seen and moves those reaching NAME_MIN_SEEN reports
+    into learned, up to limit entries. Returns True if learned grew.
+    """
+    added = False
+    for value in seen:
+        if value in learned:
+            continue
+        counts[value] += 1
+        if counts[value] >= NAME_MIN_SEEN and len(learned) < limit:
+            learned.add(value)
+            del counts[value]
+            added = True
+    if len(counts) > max_candidates:
+        counts.clear()
+    return added
+
+def _synthetic_lab(rng, lab_id):
+    """
+    A fake lab layout: fixed header, footer, column spacing and test list.
+    """
+    tests = [
+        ("Hemoglobin", "g/dL", "13.0-17.0"), ("Total Leukocyte Count", "/uL", "4000-11000"),
+        ("Platelet Count", "/uL", "150000-450000"), ("Glucose Fasting", "mg/dL", "70-110"),
+        ("Serum Cholesterol, Total", "mg/dL", "< 200"), ("HDL Cholesterol", "mg/dL", "40-60"),
+        ("Triglycerides", "mg/dL", "< 150"), ("Serum Creatinine", "mg/dL", "0.7-1.3"),
+        ("Sodium", "mmol/L", "135-145"), ("Potassium", "mmol/L", "3.5-5.0"),
+        ("TSH", "IU/mL", "0.4-4.0"), ("SGPT", "U/L", "(0-40)"), ("Calcium", "mg/dL", "8.5-10.2"),
+    ]
+    # Each lab gets its own name and address words, as real letterheads do
+    word = lambda: "".join(rng.choice("bcdfghklmnprstv") + rng.choice("aeiou") for _ in range(rng.randint(2, 4)))
+    return {
+        "header": [
+            f"{word().title()} {word().title()} Diagnostics Lab",
+            f"{rng.randint(1, 99)} {word().title()} Road, {word().title()} Nagar, {word().title()}",
+            "Department of Biochemistry and Haematology",
+        ],
+        "footer": ["Checked and verified by consultant pathologist", "Results relate only to the sample tested"],
+        "tests": rng.sample(tests, rng.randint(6, len(tests))),
+        "gap": " " * rng.randint(1, 6),
+    }
+
+def _synthetic_report(rng, lab, noise=0.0):
+    from modules.fuzzy_matcher import _corrupt
+
+    lines = list(lab["header"])
+    lines.append(f"Patient {rng.choice(['Ravi', 'Sita', 'Arjun', 'Meena'])} {rng.choice(['Rao', 'Devi', 'Kumar'])} Ref {rng.randint(1000, 9999)}")
+    lines.append("Test Observed Units Range")
+    for name, unit, ref in lab["tests"]:
+        if rng.random() < noise:
+            name = _corrupt(name, rng)
+        value = rng.randint(1, 9999) if unit == "/uL" else round(rng.uniform(0.5, 300), 1)
+        lines.append(f"{name}{lab['gap']}{value}{lab['gap']}{unit}{lab['gap']}{ref}")
+    lines.extend(lab["footer"])
+    return "\n".join(lines)
+
+def benchmark(labs=24, reports=2000, rounds=5, noise=0.0, seed=0):
+    """
+    Per-lab hit rate and speedup of extract_medical_data with the layout
+    cache versus the generic path alone, on synthetic reports from a fixed
+    set of lab layouts, with a noise share of test names OCR-corrupted.
+    Also checks both paths return identical rows.
+    The paths alternate for several rounds and the best round of each counts.
+    Run with: python -m modules.layout_cache
+    """
+    import time
+    import random
+    from modules import nlp_processor
+
+    rng = random.Random(seed)
+    layouts = [_synthetic_lab(rng, i) for i in range(labs)]
+    sources = [rng.randrange(labs) for _ in range(reports)]
+    corpus = [_synthetic_report(rng, layouts[lab], noise) for lab in sources]
+
+    # Start from an empty cache so each scenario learns from scratch
+    cache = nlp_processor.LAYOUT_CACHE = LayoutCache(nlp_processor.build_layout_pattern, enabled=True)
+    # First pass learns the templates and is what the hit rates describe;
+    # the known source lab of each report says which lookups missed
+    lab_reports, lab_hits = Counter(sources), Counter()
+    cached = []
+    for lab, text in zip(sources, corpus):
+        hits_before = sum(t.hits for t in cache.templates.values())
+        cached.append(nlp_processor.extract_medical_data(text))
+        lab_hits[lab] += sum(t.hits for t in cache.templates.values()) - hits_before
+    stats = cache.stats()
+
+    def timed(enabled):
+        cache.enabled = enabled
+        start = time.perf_counter()
+        output = [nlp_processor.extract_medical_data(text) for text in corpus]
+        return time.perf_counter() - start, output
+
+    generic_time = cached_time = float("inf")
+    for _ in range(rounds):
+        elapsed, generic = timed(False)
+        generic_time = min(generic_time, elapsed)
+        elapsed, _ = timed(True)
+        cached_time = min(cached_time, elapsed)
+
+    mismatches = sum(a != b for a, b in zip(generic, cached))
+    print(f"{reports} reports from {labs} layouts ({noise:.0%} noisy names), "
+          f"{len(stats['templates'])} templates learned")
+    print(f"Template hit rate: {stats['hit_rate']:.1%}")
+    for lab in sorted(lab_reports):
+        print(f"  lab {lab:>2}: {lab_hits[lab]:>4} of {lab_reports[lab]:>4} reports hit "
+              f"({lab_hits[lab] / lab_reports[lab]:.1%})")
+    for template in stats["templates"]:
+        print(f"  template {template['template_id']:>2}: {template['hits']:>4} hits, "
+              f"{template['known_tests']} tests, {template['ignore_lines']} ignore lines")
+    print(f"Generic: {generic_time / reports * 1e6:.0f} us/report, "
+          f"cached: {cached_time / reports * 1e6:.0f} us/report "
+          f"({generic_time / cached_time:.2f}x), mismatched reports: {mismatches}")
+
+if __name__ == '__main__':
+    benchmark()
+    benchmark(labs=1, reports=6000, noise=0.5)
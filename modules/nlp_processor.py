@@ -1,4 +1,7 @@
 import re
+from functools import lru_cache
+from modules.fuzzy_matcher import FuzzyIndex, TEST_ALIASES
+from modules.layout_cache import LayoutCache, layout_fingerprint
 
 # Vocabulary and Filter Lists
 IGNORED_TERMS = {
@@ -18,6 +21,43 @@ COMMON_MEDICAL_TESTS = {
     "globulin", "alkaline phosphatase", "sgot", "sgpt", "ggt", "esr", "pcr"
 }
 
+# Single-pass form of the IGNORED_TERMS substring check
+IGNORED_TERMS_PATTERN = re.compile("|".join(re.escape(term) for term in IGNORED_TERMS))
+
+# Fuzzy fallback for OCR-noisy names (e.g. "Cho1esterol")
+TEST_NAME_INDEX = FuzzyIndex(COMMON_MEDICAL_TESTS, TEST_ALIASES)
+
+# Expanded Unit List
+UNITS = [
+    "mg/dL", "g/dL", "ng/mL", "ug/dL", "mEq/L", "U/L", "IU/L", 
+    "mmol/L", "µmol/L", "/uL", "count/uL", "million/uL", "x10^3/uL", 
+    "x10^6/uL", "fl", "pg", "L", "mL", "%", "g/L", "IU/mL", "mOsm/kg"
+]
+# Sorted by length descending to match longer units first (e.g., mg/dL vs L)
+UNITS.sort(key=len, reverse=True)
+unit_regex_part = "|".join([re.escape(u) for u in UNITS])
+
+# Relaxed Regex to capture potential lines
+# Structure: Name ... Value ... Unit ... (Range)?
+# The name must end on a non-space character so it cannot compete with the
+# following \s+ for the same whitespace; otherwise long blank runs in OCR
+# text backtrack quadratically. A lone letter counts only before 2+ blanks,
+# where the old name group matched it as letter + blank.
+name_pattern = r"(?P<name>[a-zA-Z](?:(?=\s\s)|[a-zA-Z0-9\s\(\)\-\,\.\:%]*?[a-zA-Z0-9\(\)\-\,\.\:%]))"
+value_pattern = r"(?P<value>\d{1,5}(\.\d{1,3})?)"
+unit_pattern = fr"(?P<unit>{unit_regex_part})" # Make unit mandatory for regex matching initially? No, pattern matching first.
+range_pattern = r"(?P<range>(\d+(\.\d+)?\s*[\-–]\s*\d+(\.\d+)?)|([<>]\s*\d+(\.\d+)?)|(\(\d+(\.\d+)?\s*[\-–]\s*\d+(\.\d+)?\)))?"
+
+# Only the start of a line is needed to match; trailing text is ignored (.*$)
+FULL_PATTERN = re.compile(
+    fr"^\s*{name_pattern}\s+{value_pattern}\s*{unit_pattern}\s*{range_pattern}",
+    re.IGNORECASE
+)
+
+# Rows of a lab table are short. Longer lines (tables flattened by bad OCR)
+# are truncated before matching so the per-line cost stays bounded.
+MAX_LINE_LENGTH = 512
+
 def clean_test_name(name):
     """
     Cleans the test name by removing non-alphanumeric characters (except valid ones)
@@ -27,16 +67,27 @@ def clean_test_name(name):
     name = re.sub(r"^[^a-zA-Z0-9(]+|[^a-zA-Z0-9)]+$", "", name.strip())
     return name
 
+@lru_cache(maxsize=1024)
+def name_confidence(test_name_lower):
+    """
+    Vocabulary part of the confidence score; lab reports repeat the same test
+    names, so results are cached.
+    """
+    if any(med_test in test_name_lower for med_test in COMMON_MEDICAL_TESTS):
+        return 3
+
+    # Fuzzy match scores lower the more edits it needed
+    _, distance = TEST_NAME_INDEX.resolve(test_name_lower)
+    if distance is not None:
+        return 3 - distance
+    return 0
+
 def calculate_confidence(test_name, unit, ref_range):
     """
     Calculates a confidence score for the extracted item.
     """
-    score = 0
-    test_name_lower = test_name.lower()
-    
     # 1. Matches common medical test vocabulary
-    if any(med_test in test_name_lower for med_test in COMMON_MEDICAL_TESTS):
-        score += 3
+    score = name_confidence(test_name.lower())
         
     # 2. Has a valid unit
     if unit:
@@ -52,97 +103,127 @@ def calculate_confidence(test_name, unit, ref_range):
         
     return score
 
+def build_layout_pattern(names, units):
+    """
+    Builds the row pattern for a known lab template: the same grammar as
+    FULL_PATTERN, but the name is one of the lab's known test names and the
+    unit one of its known units. Shortest names first, mirroring the lazy
+    name group of the generic pattern.
+    """
+    name_part = "|".join(re.escape(n) for n in sorted(names, key=len))
+    unit_part = "|".join(re.escape(u) for u in sorted(units, key=len, reverse=True))
+    return re.compile(
+        fr"^\s*(?P<name>{name_part})\s+{value_pattern}\s*(?P<unit>{unit_part})\s*{range_pattern}",
+        re.IGNORECASE
+    )
+
+# Learned per-lab layouts; the generic path is the fallback for every line
+LAYOUT_CACHE = LayoutCache(build_layout_pattern)
+
+def parse_line(line_clean, layout_pattern=None):
+    """
+    Parses one stripped report line.
+    Tries the lab template's pattern first (if any), then the generic one.
+    Returns (raw_name, result_entry) or None if the line is not a test row.
+    """
+    # 1. Immediate keyword filtering (Noise Reduction)
+    if IGNORED_TERMS_PATTERN.search(line_clean.lower()):
+        return None
+
+    match = None
+    if layout_pattern is not None:
+        match = layout_pattern.match(line_clean[:MAX_LINE_LENGTH])
+    if match is None:
+        match = FULL_PATTERN.match(line_clean[:MAX_LINE_LENGTH])
+
+    if not match:
+        return None
+
+    item = match.groupdict()
+    
+    raw_name = item['name']
+    value_str = item['value']
+    unit = item['unit']
+    ref_range = item['range'] if item['range'] else ""
+
+    # 2. Strict Unit Check (User Requirement 3)
+    # If no unit captured by regex, ignore line? 
+    # Yes, user said "Ignore rows without valid medical units"
+    if not unit:
+        return None
+
+    # 3. Post-Processing & Validation
+    test_name = clean_test_name(raw_name)
+    
+    # Filter out headers that might look like tests
+    if test_name.lower() in IGNORED_TERMS or len(test_name) < 2:
+        return None
+
+    try:
+        value = float(value_str)
+    except ValueError:
+        return None
+        
+    # 4. Confidence Scoring
+    confidence = calculate_confidence(test_name, unit, ref_range)
+    
+    # Threshold for acceptance
+    if confidence < 2: # At least Unit matches (score 2) or Name+Range(3+1)
+        return None
+
+    # Fix range formatting
+    if ref_range:
+        ref_range = ref_range.strip("()")
+
+    return raw_name, {
+        "test": test_name,
+        "value": value,
+        "unit": unit.strip(),
+        "range": ref_range.strip()
+    }
+
 def extract_medical_data(text):
     """
     Extracts medical test information from raw text using intelligent filtering.
+    Reports from a recognized lab layout use that lab's cached row parser and
+    skip its known boilerplate lines; successful parses teach the layout cache.
     """
     results_dict = {} # Use dict for deduplication
     lines = text.split('\n')
-    
-    # Expanded Unit List
-    units = [
-        "mg/dL", "g/dL", "ng/mL", "ug/dL", "mEq/L", "U/L", "IU/L", 
-        "mmol/L", "µmol/L", "/uL", "count/uL", "million/uL", "x10^3/uL", 
-        "x10^6/uL", "fl", "pg", "L", "mL", "%", "g/L", "IU/mL", "mOsm/kg"
-    ]
-    # Sorted by length descending to match longer units first (e.g., mg/dL vs L)
-    units.sort(key=len, reverse=True)
-    unit_regex_part = "|".join([re.escape(u) for u in units])
-    
-    # Relaxed Regex to capture potential lines
-    # Structure: Name ... Value ... Unit ... (Range)?
-    name_pattern = r"(?P<name>[a-zA-Z][a-zA-Z0-9\s\(\)\-\,\.\:%]+?)"
-    value_pattern = r"(?P<value>\d{1,5}(\.\d{1,3})?)"
-    unit_pattern = fr"(?P<unit>{unit_regex_part})" # Make unit mandatory for regex matching initially? No, pattern matching first.
-    range_pattern = r"(?P<range>(\d+(\.\d+)?\s*[\-–]\s*\d+(\.\d+)?)|([<>]\s*\d+(\.\d+)?)|(\(\d+(\.\d+)?\s*[\-–]\s*\d+(\.\d+)?\)))?"
-
-    full_pattern = re.compile(
-        fr"^\s*{name_pattern}\s+{value_pattern}\s*{unit_pattern}\s*{range_pattern}.*$",
-        re.IGNORECASE | re.MULTILINE
-    )
 
+    # 0. Layout fingerprinting
+    fingerprint = layout_fingerprint(lines)
+    template = LAYOUT_CACHE.match(fingerprint)
+    layout_pattern = template.parser if template else None
+    ignore_lines = template.ignore_lines if template else ()
+
+    learned_names, learned_units, empty_lines = set(), set(), []
+    
     for line in lines:
         line_clean = line.strip()
-        if not line_clean:
+        if not line_clean or (ignore_lines and hash(line_clean) in ignore_lines):
             continue
-            
-        # 1. Immediate keyword filtering (Noise Reduction)
-        if any(ignore in line_clean.lower() for ignore in IGNORED_TERMS):
+
+        parsed = parse_line(line_clean, layout_pattern)
+        if parsed is None:
+            empty_lines.append(line_clean)
             continue
 
-        match = full_pattern.match(line_clean)
-        
-        if match:
-            item = match.groupdict()
-            
-            raw_name = item['name']
-            value_str = item['value']
-            unit = item['unit']
-            ref_range = item['range'] if item['range'] else ""
-
-            # 2. Strict Unit Check (User Requirement 3)
-            # If no unit captured by regex, ignore line? 
-            # Yes, user said "Ignore rows without valid medical units"
-            if not unit:
-                continue
-
-            # 3. Post-Processing & Validation
-            test_name = clean_test_name(raw_name)
-            
-            # Filter out headers that might look like tests
-            if test_name.lower() in IGNORED_TERMS or len(test_name) < 2:
-                continue
-
-            try:
-                value = float(value_str)
-            except ValueError:
-                continue
-                
-            # 4. Confidence Scoring
-            confidence = calculate_confidence(test_name, unit, ref_range)
-            
-            # Threshold for acceptance
-            if confidence >= 2: # At least Unit matches (score 2) or Name+Range(3+1)
-                
-                # Fix range formatting
-                if ref_range:
-                    ref_range = ref_range.strip("()")
-
-                result_entry = {
-                    "test": test_name,
-                    "value": value,
-                    "unit": unit.strip(),
-                    "range": ref_range.strip()
-                }
-                
-                # Deduplication logic: 
-                # If test exists, keep the one with higher confidence or more complete info
-                # Simple heuristic: overwriting usually works for finding the "result" vs "range" line
-                if test_name not in results_dict:
-                    results_dict[test_name] = result_entry
-                else:
-                    # Optional: Could compare if new one has range and old one didn't
-                    if not results_dict[test_name]['range'] and ref_range:
-                        results_dict[test_name] = result_entry
+        raw_name, result_entry = parsed
+        test_name = result_entry["test"]
+        learned_names.add(raw_name)
+        learned_units.add(result_entry["unit"])
+
+        # Deduplication logic: 
+        # If test exists, keep the one with higher confidence or more complete info
+        # Simple heuristic: overwriting usually works for finding the "result" vs "range" line
+        if test_name not in results_dict:
+            results_dict[test_name] = result_entry
+        else:
+            # Optional: Could compare if new one has range and old one didn't
+            if not results_dict[test_name]['range'] and result_entry['range']:
+                results_dict[test_name] = result_entry
+
+    LAYOUT_CACHE.learn(template, fingerprint, learned_names, learned_units, empty_lines)
     
     return list(results_dict.values())
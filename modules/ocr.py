@@ -35,7 +35,7 @@ def extract_text_from_image(image_path):
     Returns None if extraction fails.
     """
     if not os.path.exists(image_path):
-        logger.error(f"File not found: {image_path}")
+        logger.error("File not found: %s", image_path)
         return None
 
     try:
@@ -43,8 +43,8 @@ def extract_text_from_image(image_path):
             # Tesseract can fail on very small or corrupt images
             text = pytesseract.image_to_string(image)
             if not text.strip():
-                logger.warning(f"OCR returned empty text for {image_path}")
+                logger.warning("OCR returned empty text for %s", image_path)
             return text.strip()
     except Exception as e:
-        logger.error(f"OCR failed for {image_path}: {e}", exc_info=True)
+        logger.error("OCR failed for %s: %s", image_path, e, exc_info=True)
         return None
@@ -12,7 +12,7 @@ def extract_text_from_pdf(pdf_path):
     try:
         with pdfplumber.open(pdf_path) as pdf:
             if not pdf.pages:
-                logger.warning(f"PDF has no pages: {pdf_path}")
+                logger.warning("PDF has no pages: %s", pdf_path)
                 return None
                 
             for i, page in enumerate(pdf.pages):
@@ -21,13 +21,13 @@ def extract_text_from_pdf(pdf_path):
                     if page_text:
                         text += page_text + "\n"
                 except Exception as e:
-                     logger.warning(f"Failed to extract text from page {i} of {pdf_path}: {e}")
+                     logger.warning("Failed to extract text from page %s of %s: %s", i, pdf_path, e)
                      continue # Try next page
         
         if not text.strip():
-            logger.warning(f"PDF extraction resulted in empty text: {pdf_path}")
+            logger.warning("PDF extraction resulted in empty text: %s", pdf_path)
             
         return text
     except Exception as e:
-        logger.error(f"Critical PDF processing failure for {pdf_path}: {e}", exc_info=True)
+        logger.error("Critical PDF processing failure for %s: %s", pdf_path, e, exc_info=True)
         return None
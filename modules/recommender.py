@@ -1,3 +1,4 @@
+from modules.fuzzy_matcher import FuzzyIndex, CLINICAL_ALIASES, MAX_CLINICAL_DISTANCE
 
 RECOMMENDATIONS_KB = {
     "hemoglobin": {
@@ -71,6 +72,9 @@ RECOMMENDATIONS_KB = {
     }
 }
 
+# Fuzzy fallback when the simple keyword match misses (OCR-noisy names)
+RECOMMENDATIONS_INDEX = FuzzyIndex(RECOMMENDATIONS_KB, CLINICAL_ALIASES, whole_name=True)
+
 def get_recommendations(analyzed_data):
     """
     Generates recommendations based on analyzed medical data.
@@ -97,6 +101,10 @@ def get_recommendations(analyzed_data):
                 if key in test_name:
                     kb_match = RECOMMENDATIONS_KB[key]
                     break
+            if not kb_match:
+                key, distance = RECOMMENDATIONS_INDEX.resolve(test_name)
+                if key and distance <= MAX_CLINICAL_DISTANCE:
+                    kb_match = RECOMMENDATIONS_KB[key]
             
             if kb_match and status in kb_match:
                 rec_data = kb_match[status]
@@ -26,5 +26,5 @@ def translate_text(text, target_lang):
         translated = GoogleTranslator(source='auto', target=target_lang).translate(text)
         return translated if translated else text
     except Exception as e:
-        logger.warning(f"DeepTranslator failed for '{text[:20]}...': {e}")
+        logger.warning("DeepTranslator failed for '%s...': %s", text[:20], e)
         return text 
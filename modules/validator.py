@@ -67,8 +67,9 @@ def validate_medical_report(text):
 
     is_valid = total_score >= THRESHOLD
     
-    logger.info(f"Validator Details -> Score: {total_score} (Threshold: {THRESHOLD}). Valid: {is_valid}")
-    logger.info(f"Breakdown -> Keywords: {len(found_keywords)} ({found_keywords}), Structure: {len(found_structure)}, Units: {found_units}")
+    logger.info("Validator Details -> Score: %s (Threshold: %s). Valid: %s", total_score, THRESHOLD, is_valid)
+    logger.debug("Breakdown -> Keywords: %s (%s), Structure: %s, Units: %s",
+                 len(found_keywords), found_keywords, len(found_structure), found_units)
     
     details = {
         "score": total_score,
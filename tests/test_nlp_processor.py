@@ -0,0 +1,83 @@
+import re
+import time
+import random
+
+import pytest
+
+from modules import nlp_processor
+from modules.nlp_processor import (
+    FULL_PATTERN, MAX_LINE_LENGTH, UNITS, value_pattern, unit_pattern, range_pattern,
+    extract_medical_data,
+)
+
+# The pre-linear-time row pattern: its lazy name group could end in
+# whitespace, so long blank runs backtracked quadratically
+OLD_NAME_PATTERN = r"(?P<name>[a-zA-Z][a-zA-Z0-9\s\(\)\-\,\.\:%]+?)"
+OLD_PATTERN = re.compile(
+    fr"^\s*{OLD_NAME_PATTERN}\s+{value_pattern}\s*{unit_pattern}\s*{range_pattern}.*$",
+    re.IGNORECASE | re.MULTILINE
+)
+
+# Lines far above MAX_LINE_LENGTH; FULL_PATTERN is also checked uncapped
+PATHOLOGICAL_LINE_LENGTH = 100000
+PATHOLOGICAL_TIME_LIMIT = 0.1 # seconds per line; the old pattern took minutes at this length
+
+PATHOLOGICAL_LINES = {
+    "blank run": "a" + " " * PATHOLOGICAL_LINE_LENGTH + "x",
+    "tab run": "Hemoglobin" + "\t" * PATHOLOGICAL_LINE_LENGTH + "g/dL",
+    "name and digits": ("Hb " + "1 ") * (PATHOLOGICAL_LINE_LENGTH // 5),
+    "words": "abc def " * (PATHOLOGICAL_LINE_LENGTH // 8),
+    "digit run": "Hemoglobin 1 g/dL " + "9" * PATHOLOGICAL_LINE_LENGTH,
+    "value without unit": "Glucose 12.5 " * (PATHOLOGICAL_LINE_LENGTH // 13),
+    "flattened table": "Hemoglobin 13.5 g/dL 13-17 " * (PATHOLOGICAL_LINE_LENGTH // 27),
+    "punctuation": "A" + "(-,.:%" * (PATHOLOGICAL_LINE_LENGTH // 6) + " 5",
+    "range digits": "Hemoglobin 5 g/dL " + "1" * PATHOLOGICAL_LINE_LENGTH + "-",
+}
+
+DIFFERENTIAL_LINES = 50000
+DIFFERENTIAL_SEED = 0
+
+def _timed(func, *args):
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+@pytest.mark.parametrize("line", PATHOLOGICAL_LINES.values(), ids=PATHOLOGICAL_LINES.keys())
+def test_pathological_line_is_fast(line):
+    assert _timed(extract_medical_data, line) < PATHOLOGICAL_TIME_LIMIT
+    assert _timed(FULL_PATTERN.match, line) < PATHOLOGICAL_TIME_LIMIT
+
+def _random_line(rng):
+    """
+    A table-like OCR line: name words, value, unit and range, with random
+    spacing, punctuation and dropped or swapped fields.
+    """
+    names = sorted(nlp_processor.COMMON_MEDICAL_TESTS) + ["Serum Cholesterol, Total", "HbA1c (Glycated)", "T3 - Total"]
+    space = lambda: rng.choice([" ", "  ", "\t", " " * rng.randint(3, 30), ""])
+    fields = [
+        rng.choice(names).title(),
+        f"{rng.randint(0, 99999)}" + (f".{rng.randint(0, 999)}" if rng.random() < 0.5 else ""),
+        rng.choice(UNITS),
+        rng.choice(["13-17", "(4.5 - 5.9)", "< 200", "> 40", "70 – 110", ""]),
+    ]
+    if rng.random() < 0.3:
+        fields.insert(rng.randrange(len(fields) + 1), "".join(rng.choice("abc19:.,-()% ") for _ in range(rng.randint(1, 12))))
+    if rng.random() < 0.2:
+        del fields[rng.randrange(len(fields))]
+    if rng.random() < 0.1:
+        i = rng.randrange(len(fields) - 1)
+        fields[i], fields[i + 1] = fields[i + 1], fields[i]
+    return space() + "".join(field + space() for field in fields)
+
+def _groups(match):
+    # The old name group could keep one trailing blank; clean_test_name strips it
+    return match and {
+        "name": match.group("name").rstrip(),
+        **{key: match.group(key) for key in ("value", "unit", "range")},
+    }
+
+def test_full_pattern_matches_old_pattern():
+    rng = random.Random(DIFFERENTIAL_SEED)
+    for _ in range(DIFFERENTIAL_LINES):
+        line = _random_line(rng).strip()
+        assert _groups(FULL_PATTERN.match(line[:MAX_LINE_LENGTH])) == _groups(OLD_PATTERN.match(line)), line
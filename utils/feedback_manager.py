@@ -1,34 +1,198 @@
 import os
 import csv
+import sqlite3
 import datetime
+import threading
 import logging
 
-FEEDBACK_FILE = "user_feedback.csv"
+import pandas as pd
+
+FEEDBACK_FILE = "user_feedback.csv" # Legacy store, imported once into FEEDBACK_DB
+FEEDBACK_DB = os.environ.get("FEEDBACK_DB", "user_feedback.db")
+# Rows read per chunk by the aggregation API
+FEEDBACK_CHUNK_SIZE = 10000
+LEGACY_IMPORT_KEY = "legacy_csv_imported" # meta row recording the one-time CSV import
 logger = logging.getLogger(__name__)
 
-def save_feedback(helpful, comment):
+_connection = None
+_connection_lock = threading.Lock()
+
+def _get_connection():
+    """
+    Opens (once per process) the SQLite feedback store in WAL mode.
+    WAL lets gunicorn workers append concurrently without interleaving rows;
+    busy_timeout makes a writer wait for the lock instead of failing.
+    """
+    global _connection
+    with _connection_lock:
+        if _connection is None:
+            connection = sqlite3.connect(FEEDBACK_DB, timeout=10, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS feedback ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                "timestamp TEXT NOT NULL, "
+                "helpful INTEGER NOT NULL, "
+                "language TEXT NOT NULL DEFAULT 'en', "
+                "comment TEXT)"
+            )
+            connection.execute("CREATE INDEX IF NOT EXISTS idx_feedback_timestamp ON feedback (timestamp)")
+            connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            connection.commit()
+            _import_legacy_csv(connection)
+            _connection = connection
+    return _connection
+
+def _import_legacy_csv(connection):
+    """
+    Moves rows from the old user_feedback.csv into the database exactly once.
+    The rows and a marker in the meta table are written in one BEGIN IMMEDIATE
+    transaction, so when several workers start together only the first one
+    imports; the others wait for its write lock and then see the marker.
+    """
+    if not os.path.isfile(FEEDBACK_FILE):
+        return
+
+    try:
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if connection.execute("SELECT 1 FROM meta WHERE key = ?", (LEGACY_IMPORT_KEY,)).fetchone():
+                connection.rollback()
+                return
+            with open(FEEDBACK_FILE, newline='', encoding='utf-8') as file:
+                rows = [
+                    (row["Timestamp"], _is_helpful(row["Helpful"]), "en", row.get("Comment", ""))
+                    for row in csv.DictReader(file)
+                ]
+            connection.executemany(
+                "INSERT INTO feedback (timestamp, helpful, language, comment) VALUES (?, ?, ?, ?)", rows
+            )
+            connection.execute(
+                "INSERT INTO meta (key, value) VALUES (?, ?)",
+                (LEGACY_IMPORT_KEY, datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+            )
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+        logger.info("Imported %s feedback rows from %s", len(rows), FEEDBACK_FILE)
+    except Exception as e:
+        logger.error("Failed to import legacy feedback CSV: %s", e)
+        return
+
+    # The marker is what prevents a second import; the rename is just housekeeping
+    try:
+        os.replace(FEEDBACK_FILE, FEEDBACK_FILE + ".imported")
+    except OSError as e:
+        logger.warning("Imported %s but could not rename it: %s", FEEDBACK_FILE, e)
+
+def _is_helpful(helpful):
+    return 1 if str(helpful).strip().lower() in ("yes", "true", "1") else 0
+
+def save_feedback(helpful, comment, language="en"):
     """
-    Saves anonymous user feedback to a local CSV file.
+    Saves anonymous user feedback to the local SQLite store.
     helpful: str ("Yes" / "No")
     comment: str (Optional text)
+    language: str (UI language code, used for per-language analytics)
     """
-    file_exists = os.path.isfile(FEEDBACK_FILE)
-    
     try:
-        with open(FEEDBACK_FILE, mode='a', newline='', encoding='utf-8') as file:
-            writer = csv.writer(file)
-            
-            # Write header if file is new
-            if not file_exists:
-                writer.writerow(["Timestamp", "Helpful", "Comment"])
-                
-            # Write data
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            # Sanitize content slightly to prevent CSV injection issues if opened in Excel
-            clean_comment = comment.replace("=", "").replace("@", "").strip() if comment else ""
-            
-            writer.writerow([timestamp, helpful, clean_comment])
-            return True
+        timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # Sanitize content slightly to prevent CSV injection issues if exported to Excel
+        clean_comment = comment.replace("=", "").replace("@", "").strip() if comment else ""
+
+        connection = _get_connection()
+        with _connection_lock, connection:
+            connection.execute(
+                "INSERT INTO feedback (timestamp, helpful, language, comment) VALUES (?, ?, ?, ?)",
+                (timestamp, _is_helpful(helpful), language or "en", clean_comment)
+            )
+        return True
     except Exception as e:
-        logger.error(f"Failed to save feedback: {e}")
+        logger.error("Failed to save feedback: %s", e)
         return False
+
+def get_feedback_summary(freq="D", since=None):
+    """
+    Helpful rate over time, per language.
+
+    Args:
+        freq (str): pandas period alias for the time buckets ("D", "W", "M").
+        since (str): Optional "YYYY-MM-DD" lower bound on the timestamp.
+
+    Returns:
+        DataFrame: columns period, language, total, helpful, helpful_rate.
+    """
+    query = "SELECT timestamp, helpful, language FROM feedback"
+    params = ()
+    if since:
+        query += " WHERE timestamp >= ?"
+        params = (since,)
+
+    # Aggregate chunk by chunk so memory stays flat however large the store is.
+    # A separate read connection: under WAL it sees a consistent snapshot
+    # without blocking (or being blocked by) save_feedback().
+    _get_connection() # creates the schema and runs the legacy import if needed
+    partials = []
+    connection = sqlite3.connect(FEEDBACK_DB, timeout=10)
+    try:
+        for chunk in pd.read_sql_query(query, connection, params=params, chunksize=FEEDBACK_CHUNK_SIZE):
+            chunk["period"] = pd.to_datetime(chunk["timestamp"]).dt.to_period(freq)
+            partials.append(chunk.groupby(["period", "language"])["helpful"].agg(["size", "sum"]))
+    finally:
+        connection.close()
+
+    if not partials:
+        return pd.DataFrame(columns=["period", "language", "total", "helpful", "helpful_rate"])
+
+    summary = pd.concat(partials).groupby(level=["period", "language"]).sum()
+    summary = summary.rename(columns={"size": "total", "sum": "helpful"}).reset_index()
+    summary["helpful_rate"] = summary["helpful"] / summary["total"]
+    return summary
+
+def _benchmark_worker(store, submissions):
+    global FEEDBACK_DB, _connection
+    FEEDBACK_DB, _connection = store, None
+    for i in range(submissions):
+        save_feedback("Yes" if i % 3 else "No", f"comment {i}", "hi" if i % 2 else "en")
+
+def benchmark(workers=4, submissions=500):
+    """
+    Concurrent submissions per second from several processes (like gunicorn
+    workers) writing to one store, plus the cost of get_feedback_summary().
+    Run with: python -m utils.feedback_manager
+    """
+    import time
+    import tempfile
+    import multiprocessing
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = os.path.join(tmp, "feedback.db")
+        processes = [
+            multiprocessing.Process(target=_benchmark_worker, args=(store, submissions))
+            for _ in range(workers)
+        ]
+        start = time.perf_counter()
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        elapsed = time.perf_counter() - start
+
+        global FEEDBACK_DB, _connection
+        FEEDBACK_DB, _connection = store, None
+        start = time.perf_counter()
+        summary = get_feedback_summary()
+        summary_time = time.perf_counter() - start
+        stored = int(summary["total"].sum())
+        _connection.close()
+        _connection = None
+
+    total = workers * submissions
+    print(f"{workers} processes x {submissions} submissions: {total / elapsed:.0f} submissions/s")
+    print(f"Rows stored: {stored} of {total}")
+    print(f"get_feedback_summary: {summary_time * 1000:.1f} ms")
+
+if __name__ == '__main__':
+    benchmark()
@@ -28,7 +28,7 @@ def save_uploaded_file(uploaded_file, upload_folder):
         uploaded_file.save(file_path)
         return file_path
     except Exception as e:
-        logger.error(f"Failed to save file {filename}: {e}")
+        logger.error("Failed to save file %s: %s", filename, e)
         return None
 
 def delete_file(file_path):
@@ -42,6 +42,6 @@ def delete_file(file_path):
         try:
             os.remove(file_path)
         except Exception as e:
-             logger.error(f"Error deleting file {file_path}: {e}")
+             logger.error("Error deleting file %s: %s", file_path, e)
     else:
-        logger.warning(f"File not found for deletion: {file_path}")
+        logger.warning("File not found for deletion: %s", file_path)
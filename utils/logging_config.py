@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import queue
+import atexit
+import random
+import logging
+import logging.handlers
+
+from flask import g, has_request_context
+
+from utils.profiler import parse_sample_rate
+
+# Logging Configuration
+# LOG_FORMAT=json emits one JSON object per line (request id, stage timings);
+# anything else keeps the plain text format.
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "text").lower()
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+# Fraction of DEBUG records kept (they are dropped before being queued)
+LOG_DEBUG_SAMPLE_RATE = parse_sample_rate("LOG_DEBUG_SAMPLE_RATE", "0.1")
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(request_id)s - %(message)s'
+
+_listener = None
+
+class RequestContextFilter(logging.Filter):
+    """
+    Stamps each record with the current request id (or '-') while still on the
+    request thread, before it is handed to the listener.
+    """
+
+    def filter(self, record):
+        request_id = g.get("request_id") if has_request_context() else None
+        record.request_id = request_id or "-"
+        return True
+
+class DebugSamplingFilter(logging.Filter):
+    """
+    Keeps only a LOG_DEBUG_SAMPLE_RATE fraction of DEBUG records.
+    """
+
+    def __init__(self, rate):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record):
+        return record.levelno > logging.DEBUG or random.random() < self.rate
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that skips formatting on the calling thread.
+    The stock prepare() merges args into the message before enqueuing; here
+    the record goes onto the in-process queue untouched and the listener
+    thread does all %-formatting and I/O.
+    """
+
+    def prepare(self, record):
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats records as single-line JSON objects.
+    """
+
+    def format(self, record):
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "request_id": getattr(record, "request_id", "-"),
+            "message": record.getMessage(),
+        }
+        if hasattr(record, "stage_timings"):
+            entry["stage_timings"] = record.stage_timings
+        if record.exc_info:
+            entry["exc_info"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+def configure_logging():
+    """
+    Routes all logging through a queue so request threads only enqueue
+    records; a QueueListener thread formats and writes them to stderr.
+    Safe to call more than once.
+    """
+    global _listener
+    if _listener is not None:
+        return
+
+    output = logging.StreamHandler(sys.stderr)
+    if LOG_FORMAT == "json":
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+
+    log_queue = queue.SimpleQueue()
+    handler = DeferredQueueHandler(log_queue)
+    handler.addFilter(DebugSamplingFilter(LOG_DEBUG_SAMPLE_RATE))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    root.handlers = [handler]
+    root.setLevel(LOG_LEVEL)
+
+    _listener = logging.handlers.QueueListener(log_queue, output, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+
+def benchmark(requests=20000):
+    """
+    Per-request overhead of the logging the analyze path does (two INFO lines
+    and one DEBUG line), for: logging disabled, synchronous StreamHandler,
+    queued with every DEBUG record kept, and queued with DEBUG sampling, so
+    the effect of the queue and of sampling show up separately.
+    Output goes to a temporary file.
+    Run with: python -m utils.logging_config
+    """
+    import time
+    import tempfile
+
+    logger = logging.getLogger("benchmark")
+    keywords = sorted(["hemoglobin", "glucose", "cholesterol", "platelet", "urea", "creatinine"])
+
+    def simulate():
+        start = time.perf_counter()
+        for _ in range(requests):
+            logger.info("Validator Details -> Score: %s (Threshold: %s). Valid: %s", 42, 15, True)
+            logger.debug("Breakdown -> Keywords: %s (%s), Structure: %s, Units: %s", len(keywords), keywords, 5, 12)
+            logger.info("Pipeline finished", extra={"stage_timings": {"extract": 0.1, "validate": 0.01}})
+        return (time.perf_counter() - start) / requests * 1e6
+
+    sink = tempfile.TemporaryFile("w")
+    root = logging.getLogger()
+
+    root.handlers = []
+    root.setLevel(logging.CRITICAL)
+    disabled = simulate()
+
+    sync_handler = logging.StreamHandler(sink)
+    sync_handler.setFormatter(JsonFormatter() if LOG_FORMAT == "json" else logging.Formatter(TEXT_FORMAT))
+    sync_handler.addFilter(RequestContextFilter())
+    root.handlers = [sync_handler]
+    root.setLevel(logging.DEBUG)
+    synchronous = simulate()
+
+    def queued(sample_rate):
+        log_queue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(log_queue)
+        handler.addFilter(DebugSamplingFilter(sample_rate))
+        handler.addFilter(RequestContextFilter())
+        root.handlers = [handler]
+        listener = logging.handlers.QueueListener(log_queue, sync_handler)
+        listener.start()
+        elapsed = simulate()
+        listener.stop()
+        return elapsed
+
+    queued_all = queued(1.0)
+    queued_sampled = queued(LOG_DEBUG_SAMPLE_RATE)
+    sink.close()
+
+    print(f"Format: {LOG_FORMAT}, {requests} simulated requests")
+    print(f"Logging disabled:   {disabled:.2f} us/request")
+    print(f"Synchronous:        {synchronous:.2f} us/request")
+    print(f"Queued, all DEBUG:  {queued_all:.2f} us/request on the request thread")
+    print(f"Queued, DEBUG {LOG_DEBUG_SAMPLE_RATE:.0%}:  {queued_sampled:.2f} us/request on the request thread")
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,147 @@
+import os
+import io
+import uuid
+import random
+import logging
+import cProfile
+import pstats
+from functools import wraps
+
+from flask import g, request
+
+logger = logging.getLogger(__name__)
+
+# Profiling Configuration
+# SMARTMED_PROFILE=1 turns the feature on. When it is off, profile_request()
+# hands back the view function untouched, so there is zero per-request cost.
+PROFILING_ENABLED = os.environ.get("SMARTMED_PROFILE", "").lower() in ("1", "true", "yes")
+PROFILE_DIR = os.environ.get("SMARTMED_PROFILE_DIR", "profiles")
+def parse_sample_rate(name, default):
+    """
+    Reads a sampling rate from environment variable name, clamped to [0, 1].
+    A malformed value falls back to default (itself a valid rate string)
+    rather than stopping the app from starting.
+    """
+    value = os.environ.get(name, default)
+    try:
+        return min(max(float(value), 0.0), 1.0)
+    except ValueError:
+        logger.warning("Ignoring invalid %s %r, using %s", name, value, default)
+        return float(default)
+
+# Fraction of requests profiled without the header (0.0 = header only)
+PROFILE_SAMPLE_RATE = parse_sample_rate("SMARTMED_PROFILE_SAMPLE_RATE", "0")
+PROFILE_HEADER = "X-Profile"
+REQUEST_ID_HEADER = "X-Request-ID"
+# Number of hot spots written to the log alongside the .pstats file
+PROFILE_TOP_N = 25
+
+def _should_profile():
+    """
+    Decides whether the current request is profiled: either the client asked
+    for it via the X-Profile header or it was picked by the sampling rate.
+    """
+    if request.headers.get(PROFILE_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE
+
+def sanitize_request_id(value):
+    """
+    Keeps only characters safe for a filename and a log line (letters,
+    digits, '-' and '_'), at most 64 of them. Returns None if nothing is left.
+    """
+    if not value:
+        return None
+    return "".join(c for c in value if c.isalnum() or c in "-_")[:64] or None
+
+def _get_request_id():
+    """
+    Uses the id assigned to the request (or the caller's X-Request-ID),
+    otherwise generates one and stores it on g so logs and the echoed
+    header carry the same id as the profile file.
+    """
+    request_id = g.get("request_id") or sanitize_request_id(request.headers.get(REQUEST_ID_HEADER))
+    g.request_id = request_id or uuid.uuid4().hex
+    return g.request_id
+
+def _dump_profile(profiler, request_id):
+    """
+    Writes the collected stats to <PROFILE_DIR>/<request_id>.pstats and logs
+    the top functions by cumulative time.
+    The .pstats file can be opened with snakeviz or converted with flameprof.
+    """
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+
+    stats_path = os.path.join(PROFILE_DIR, f"{request_id}.pstats")
+    profiler.dump_stats(stats_path)
+
+    summary = io.StringIO()
+    stats = pstats.Stats(profiler, stream=summary)
+    stats.sort_stats("cumulative").print_stats(PROFILE_TOP_N)
+    logger.info("Profile written to %s\n%s", stats_path, summary.getvalue())
+    return stats_path
+
+def profile_request(view_func):
+    """
+    Decorator that runs a Flask view under cProfile on demand.
+
+    Enabled only when SMARTMED_PROFILE is set; the request must then either
+    carry 'X-Profile: 1' or be selected by SMARTMED_PROFILE_SAMPLE_RATE.
+    The profile file is named after g.request_id, which the app echoes in
+    the X-Request-ID response header.
+    Streamed responses are profiled with profile_stream() instead.
+    """
+    if not PROFILING_ENABLED:
+        return view_func
+
+    @wraps(view_func)
+    def wrapper(*args, **kwargs):
+        if not _should_profile():
+            return view_func(*args, **kwargs)
+
+        request_id = _get_request_id()
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            response = view_func(*args, **kwargs)
+        finally:
+            profiler.disable()
+            try:
+                _dump_profile(profiler, request_id)
+            except Exception as e:
+                logger.error("Failed to write profile for request %s: %s", request_id, e)
+        return response
+
+    return wrapper
+
+def profile_stream(chunks):
+    """
+    Profiles a streamed response body such as /analyze/stream. The view's
+    own return happens before any chunk is produced, so profile_request()
+    would miss the work; here the profiler runs only while the next chunk is
+    being produced and the stats are written when the stream ends or the
+    client disconnects. Call it inside the view, where the X-Profile header
+    and sampling decision can be read.
+    """
+    if not PROFILING_ENABLED or not _should_profile():
+        return chunks
+    return _profiled_chunks(chunks, _get_request_id())
+
+def _profiled_chunks(chunks, request_id):
+    profiler = cProfile.Profile()
+    iterator = iter(chunks)
+    try:
+        while True:
+            profiler.enable()
+            try:
+                chunk = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                profiler.disable()
+            yield chunk
+    finally:
+        try:
+            _dump_profile(profiler, request_id)
+        except Exception as e:
+            logger.error("Failed to write profile for request %s: %s", request_id, e)